@@ -4,25 +4,116 @@
 """
 
 import argparse
+import atexit
+import collections
+import email.utils
+import errno
+import functools
 import http.server
 import mimetypes
+import mmap
 import os
 import os.path
-import re
 import socket
 import threading
-import time
-
-import pychromecast.pychromecast as pychromecast
 
 DEFAULT_SUBTITLES_MIME_TYPE = "text/vtt"
-FILE_COPY_BUFFER_SIZE = 64 * 1024
+FILE_COPY_BUFFER_SIZE = 1024 * 1024
+SOCKET_SEND_BUFFER_SIZE = 4 * 1024 * 1024
+
+# MIME types for the media formats cast devices commonly support. Checked
+# before mimetypes.guess_type, which parses the system-wide MIME tables on
+# first use.
+_STATIC_MIME_TYPES = {
+    ".mp4": "video/mp4",
+    ".m4v": "video/mp4",
+    ".mkv": "video/x-matroska",
+    ".webm": "video/webm",
+    ".mp3": "audio/mpeg",
+    ".flac": "audio/flac",
+    ".vtt": "text/vtt",
+    ".srt": "application/x-subrip",
+}
+
+
+def _GuessMimeType(file_path):
+  """Returns the MIME type to serve a file with.
+
+  Args:
+    file_path: str, The path of the file.
+
+  Returns:
+    str, The MIME type for the file.
+  """
+  mime_type = _STATIC_MIME_TYPES.get(os.path.splitext(file_path)[1].lower())
+  if not mime_type:
+    mime_type, _ = mimetypes.guess_type(file_path)
+  return mime_type if mime_type else "application/octet-stream"
 
 
-# Global variables containing the paths of files to be served via HTTP.
-global_video_file = None
-global_subtitles_file = None
-global_subtitles_mime_type = DEFAULT_SUBTITLES_MIME_TYPE
+# Whether to log individual HTTP requests to stderr.
+global_verbose = False
+
+# Chunk size for the non-sendfile copy paths; overridable on the command line.
+global_copy_buffer_size = FILE_COPY_BUFFER_SIZE
+
+
+# A file held open (and memory-mapped, when possible) for the lifetime of the
+# HTTP server, along with its size and mtime captured at startup and the
+# response header blocks pre-serialized from them. header_200 is a complete
+# header block for full-file responses; header_206_template has %d slots for
+# range start, range end, file size, and content length; header_416 is a
+# complete block for ranges that start at or past the end of the file. mmap
+# is None for files that cannot be mapped (e.g. empty ones).
+_ServedFile = collections.namedtuple(
+    "_ServedFile", ["path", "file", "mmap", "mime_type", "size", "mtime",
+                    "header_200", "header_206_template", "header_416"])
+
+
+def _OpenServedFile(file_path, mime_type=None):
+  """Opens a file once for the lifetime of the HTTP server.
+
+  Args:
+    file_path: str, The path of the file to serve.
+    mime_type: Optional[str], The MIME type to serve the file with. Guessed
+        from the file name if not provided.
+
+  Returns:
+    _ServedFile, the persistent handle for the file.
+  """
+  if not mime_type:
+    mime_type = _GuessMimeType(file_path)
+  f = open(file_path, "rb")
+  atexit.register(f.close)
+  try:
+    mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    atexit.register(mapped.close)
+    if hasattr(mmap, "MADV_SEQUENTIAL"):
+      # Media is consumed front to back; let the kernel read ahead
+      # aggressively.
+      mapped.madvise(mmap.MADV_SEQUENTIAL)
+  except ValueError:
+    # Zero-length files (e.g. an empty subtitles file) cannot be mapped.
+    mapped = None
+  file_stat = os.fstat(f.fileno())
+  last_modified = email.utils.formatdate(file_stat.st_mtime, usegmt=True)
+  common_headers = ("Content-Type: {}\r\n"
+                    "Last-Modified: {}\r\n"
+                    "Accept-Ranges: bytes\r\n"
+                    "Access-Control-Allow-Origin: *\r\n"
+                    "Connection: keep-alive\r\n").format(
+                        mime_type, last_modified).encode("latin-1")
+  header_200 = (b"HTTP/1.1 200 OK\r\n" + common_headers +
+                b"Content-Length: %d\r\n\r\n" % file_stat.st_size)
+  header_206_template = (b"HTTP/1.1 206 Partial Content\r\n" + common_headers +
+                         b"Content-Range: bytes %d-%d/%d\r\n"
+                         b"Content-Length: %d\r\n\r\n")
+  header_416 = (b"HTTP/1.1 416 Range Not Satisfiable\r\n" + common_headers +
+                b"Content-Range: bytes */%d\r\n" % file_stat.st_size +
+                b"Content-Length: 0\r\n\r\n")
+  return _ServedFile(file_path, f, mapped, mime_type, file_stat.st_size,
+                     file_stat.st_mtime, header_200, header_206_template,
+                     header_416)
 
 
 class CastHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
@@ -32,78 +123,243 @@ class CastHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
   range and cross-origin resource sharing (CORS).
   """
 
+  protocol_version = "HTTP/1.1"
+
+  # Maps request paths (e.g. "/video") to _ServedFile entries. Populated in
+  # main() before the HTTP server starts.
+  served_files = {}
+
+  def setup(self):
+    # Disable Nagle's algorithm and enlarge the kernel send buffer so streamed
+    # chunks go out without waiting on userspace.
+    self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    self.request.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF,
+                            SOCKET_SEND_BUFFER_SIZE)
+    super().setup()
+
+  def log_message(self, format, *args):
+    # Per-request logging serializes workers on stderr; keep it opt-in.
+    if global_verbose:
+      super().log_message(format, *args)
+
   def do_HEAD(self):
     self.range_start, self.range_end = self._GetRange()
-    f = self.send_head()
-    if f:
-      f.close()
+    self.send_head()
 
   def do_GET(self):
     self.range_start, self.range_end = self._GetRange()
-    f = self.send_head()
-    if f:
-      try:
+    # Cork the socket so the header block and the first body bytes leave in
+    # full packets rather than a tinygram header packet.
+    self._SetCork(True)
+    try:
+      served = self.send_head()
+      if served:
         if self.range_start is None:
-          self.copyfile(f, self.wfile)
+          offset, count = 0, served.size
         else:
-          self.copy_range(f, self.wfile)
-      except ConnectionResetError:
-        # ConnectionResetError is normal when ChromeCast stops or seeks.
-        pass
-      finally:
-        f.close()
+          # _SendRangeHeaders already clamped range_end to the file size.
+          offset = self.range_start
+          count = 1 + self.range_end - self.range_start
+        try:
+          self._CopyRange(served, self.wfile, offset, count)
+        except (BrokenPipeError, ConnectionResetError):
+          # Dropped connections are normal when ChromeCast stops or seeks.
+          pass
+    finally:
+      self._SetCork(False)
+
+  def _SetCork(self, corked):
+    """Sets or clears TCP_CORK on the connection, where supported.
+
+    Args:
+      corked: bool, Whether to hold back partial packets.
+    """
+    if not hasattr(socket, "TCP_CORK"):
+      return
+    try:
+      self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_CORK,
+                                 1 if corked else 0)
+    except OSError:
+      # The connection may already be gone; uncorking it no longer matters.
+      pass
 
   def send_head(self):
     """Sends header common to HEAD and GET requests.
 
     Returns:
-      file, an open file containing the content to serve.
+      Optional[_ServedFile], the persistent entry for the requested file, or
+          None if the path does not name a served file or the requested range
+          is unsatisfiable (no body should be sent).
     """
-    file_path = None
-    mime_type = None
-    if self.path == "/video":
-      file_path = global_video_file
-    elif self.path == "/subtitles":
-      file_path = global_subtitles_file
-      mime_type = global_subtitles_mime_type
-    else:
+    served = self.served_files.get(self.path)
+    if served is None:
       self.send_error(404, "File not found")
       return None
 
-    try:
-      f = open(file_path, 'rb')
-    except OSError:
-      self.send_error(404, "File not found")
+    if self.range_start is None:
+      self._SendRegularHeaders(served)
+      return served
+
+    if self.range_start >= served.size:
+      # The range starts at or past end of file (always the case for an empty
+      # file). A 206 here would have a negative Content-Length, which corrupts
+      # framing on a keep-alive connection.
+      self.wfile.write(served.header_416)
       return None
 
-    try:
-      file_stat = os.fstat(f.fileno())
-      if self.range_start is None:
-        self._SendRegularHeaders(file_path, file_stat, mime_type)
-      else:
-        self._SendRangeHeaders(file_path, file_stat, mime_type)
-    except:
-      f.close()
-      raise
+    self._SendRangeHeaders(served)
+    return served
+
+  def _CopyRange(self, served, outputfile, offset, count):
+    """Copies count bytes of the served file starting at offset to output.
+
+    Serves both full-file and range responses; the offset is passed explicitly
+    everywhere (sendfile tracks it in-kernel), so the shared file object is
+    never seeked.
+
+    Args:
+      served: _ServedFile, The persistent entry for the file to serve.
+      outputfile: file, The open output file (i.e. socket) to write to.
+      offset: int, The offset in the file to start copying from.
+      count: int, The number of bytes to copy.
+    """
+    if self._Sendfile(served.file, outputfile, offset, count):
+      return
+    if self._Splice(served.file, outputfile, offset, count):
+      return
+    self._CopyFallback(served, outputfile, offset, count)
 
-    return f
+  def _Splice(self, source, outputfile, offset, count):
+    """Copies count bytes of source to output with splice(2) through a pipe.
 
-  def copy_range(self, source, outputfile):
-    """Copies the file range from range_start to range_end to output.
+    Second choice after sendfile: when the kernel refuses to sendfile between
+    a descriptor pair, splicing via a pipe can still move the data without
+    lifting it into userspace.
 
     Args:
       source: file, The open source file to serve.
       outputfile: file, The open output file (i.e. socket) to write to.
+      offset: int, The offset in source to start copying from.
+      count: int, The number of bytes to copy.
+
+    Returns:
+      bool, Whether splice is usable for these files. When False, no bytes
+          were written and the caller should fall back to a userspace copy.
+    """
+    if not hasattr(os, "splice"):
+      return False
+    outputfile.flush()
+    out_fd = outputfile.fileno()
+    in_fd = source.fileno()
+    pipe_read, pipe_write = os.pipe()
+    try:
+      remaining = count
+      while remaining > 0:
+        try:
+          in_pipe = os.splice(in_fd, pipe_write,
+                              min(global_copy_buffer_size, remaining),
+                              offset_src=offset)
+        except OSError as e:
+          if remaining == count and e.errno in (errno.EINVAL, errno.ENOSYS):
+            return False
+          raise
+        if in_pipe == 0:
+          break
+        offset += in_pipe
+        remaining -= in_pipe
+        while in_pipe > 0:
+          in_pipe -= os.splice(pipe_read, out_fd, in_pipe)
+      return True
+    finally:
+      os.close(pipe_read)
+      os.close(pipe_write)
+
+  def _CopyFallback(self, served, outputfile, offset, remaining):
+    """Copies a byte range to output without sendfile.
+
+    Serves slices of the file's memory map when one exists, otherwise falls
+    back to positional reads. Neither touches the shared file object's seek
+    position, so concurrent requests stay safe.
+
+    Args:
+      served: _ServedFile, The persistent entry for the file to serve.
+      outputfile: file, The open output file (i.e. socket) to write to.
+      offset: int, The offset in the file to start copying from.
+      remaining: int, The number of bytes to copy.
     """
-    source.seek(self.range_start)
-    remaining = 1 + self.range_end - self.range_start
+    if served.mmap is not None:
+      if hasattr(mmap, "MADV_WILLNEED"):
+        # Prefetch the requested range (madvise needs a page-aligned start).
+        page_start = offset - (offset % mmap.PAGESIZE)
+        served.mmap.madvise(mmap.MADV_WILLNEED, page_start,
+                            offset + remaining - page_start)
+      view = memoryview(served.mmap)
+      end = offset + remaining
+      while offset < end:
+        chunk_end = min(offset + global_copy_buffer_size, end)
+        outputfile.write(view[offset:chunk_end])
+        offset = chunk_end
+      return
+
+    in_fd = served.file.fileno()
+    if hasattr(os, "preadv"):
+      # Read into a single reusable buffer rather than allocating a fresh
+      # bytes object per chunk.
+      view = memoryview(bytearray(min(global_copy_buffer_size, remaining)))
+      while remaining > 0:
+        read_count = os.preadv(in_fd, [view[:min(len(view), remaining)]],
+                               offset)
+        if read_count == 0:
+          return
+        outputfile.write(view[:read_count])
+        offset += read_count
+        remaining -= read_count
+      return
+
     while remaining > 0:
-      read_buffer = source.read(min(FILE_COPY_BUFFER_SIZE, remaining))
+      read_buffer = os.pread(in_fd, min(global_copy_buffer_size, remaining),
+                             offset)
       if not read_buffer:
         return
       outputfile.write(read_buffer)
+      offset += len(read_buffer)
       remaining -= len(read_buffer)
 
+  def _Sendfile(self, source, outputfile, offset, count):
+    """Copies count bytes of source to output with in-kernel sendfile.
+
+    Avoids reading file contents into userspace buffers; the kernel copies
+    pages from the page cache directly to the socket.
+
+    Args:
+      source: file, The open source file to serve.
+      outputfile: file, The open output file (i.e. socket) to write to.
+      offset: int, The offset in source to start copying from.
+      count: int, The number of bytes to copy.
+
+    Returns:
+      bool, Whether sendfile is usable for these files. When False, no bytes
+          were written and the caller should fall back to a userspace copy.
+    """
+    if not hasattr(os, "sendfile"):
+      return False
+    outputfile.flush()
+    out_fd = outputfile.fileno()
+    in_fd = source.fileno()
+    remaining = count
+    while remaining > 0:
+      try:
+        sent = os.sendfile(out_fd, in_fd, offset, remaining)
+      except OSError as e:
+        if remaining == count and e.errno in (errno.EINVAL, errno.ENOTSOCK):
+          return False
+        raise
+      if sent == 0:
+        return True
+      offset += sent
+      remaining -= sent
+    return True
+
   def end_headers(self):
     self.send_header("Accept-Ranges", "bytes")
     self.send_header("Access-Control-Allow-Origin", "*")
@@ -119,71 +375,93 @@ class CastHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
     range_header = self.headers["Range"]
     if not range_header:
       return (None, None)
-    bytes_regex = re.compile(r"^bytes=(\d+)\-(\d+)?")
-    match = bytes_regex.search(range_header)
-    if not match:
+    range_header = range_header.strip()
+    if not range_header.startswith("bytes="):
+      return (None, None)
+    start_str, _, end_str = range_header[len("bytes="):].partition("-")
+    try:
+      range_start = int(start_str)
+      range_end = int(end_str) if end_str else None
+    except ValueError:
       return (None, None)
-    if match.group(2) is not None:
-      return (int(match.group(1)), int(match.group(2)))
-    else:
-      return (int(match.group(1)), None)
+    if range_end is not None and range_end < range_start:
+      # An inverted range makes the header invalid per RFC 7233; ignore it
+      # like any other malformed Range rather than framing a negative-length
+      # 206 body.
+      return (None, None)
+    return (range_start, range_end)
 
-  def _SendRegularHeaders(self, file_path, file_stat, mime_type):
+  def _SendRegularHeaders(self, served):
     """Sends headers for a regular (non-range) response."""
-    if not mime_type:
-      mime_type = self.guess_type(file_path)
-    self.send_response(200)
-    self.send_header("Content-type", mime_type)
-    self.send_header("Content-Length", str(file_stat.st_size))
-    self.send_header("Last-Modified", self.date_time_string(file_stat.st_mtime))
-    self.end_headers()
-
-  def _SendRangeHeaders(self, file_path, file_stat, mime_type):
+    self.wfile.write(served.header_200)
+
+  def _SendRangeHeaders(self, served):
     """Sends headers for a range response."""
-    if not mime_type:
-      mime_type = self.guess_type(file_path)
-    self.send_response(206)
-    self.send_header("Content-type", mime_type)
-    file_size = file_stat[6]
-    if self.range_end is None or self.range_end >= file_size:
-      self.range_end = file_size - 1
-    self.send_header("Content-Range",
-                     "bytes {}-{}/{}".format(self.range_start, self.range_end,
-                                       file_size))
-    self.send_header("Content-Length",
-                     str(1 + self.range_end - self.range_start))
-    self.send_header("Last-Modified", self.date_time_string(file_stat.st_mtime))
-    self.end_headers()
-
-
-class CallableHttpServer(object):
-  """Callable object that runs an HTTP server with CastHTTPRequestHandler.
+    if self.range_end is None or self.range_end >= served.size:
+      self.range_end = served.size - 1
+    self.wfile.write(served.header_206_template %
+                     (self.range_start, self.range_end, served.size,
+                      1 + self.range_end - self.range_start))
+
+
+class CastHTTPServer(http.server.ThreadingHTTPServer):
+  """ThreadingHTTPServer that can share its port with other listeners.
+
+  With SO_REUSEPORT set, several instances can bind the same port and the
+  kernel distributes incoming connections across their accept queues.
   """
 
-  def __init__(self, port):
-    """Prepares object to serve on the specified port.
+  # Enough backlog for a ChromeCast's burst of probe + range connections.
+  request_queue_size = 16
 
-    Args:
-      port: int, The port
-    """
-    self._port = port
+  def server_bind(self):
+    # HTTPServer already sets SO_REUSEADDR via allow_reuse_address, so stale
+    # TIME_WAIT bindings don't block a restart.
+    if hasattr(socket, "SO_REUSEPORT"):
+      try:
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+      except OSError:
+        # Some kernels define the constant but refuse the option.
+        pass
+    super().server_bind()
+
+
+def RunHttpServer(port, ready_event):
+  """Runs an HTTP server with CastHTTPRequestHandler indefinitely.
+
+  May run in several threads at once; see CastHTTPServer.
+
+  Args:
+    port: int, The port to serve on.
+    ready_event: threading.Event, Set once the server socket is bound and
+        listening.
+  """
+  httpd = CastHTTPServer(("", port), CastHTTPRequestHandler)
+  ready_event.set()
+  # Nothing ever calls shutdown(), so the default 0.5s shutdown-poll wakeups
+  # are pure overhead; stretch them way out.
+  httpd.serve_forever(poll_interval=30)
 
-  def __call__(self):
-    """Starts HTTP server and runs indefinitely."""
-    httpd = http.server.ThreadingHTTPServer(("", self._port),
-                                            CastHTTPRequestHandler)
-    httpd.serve_forever()
 
+@functools.lru_cache(maxsize=1)
+def _GetIp(cast_host):
+  """Returns this machine's IP address on the route to the cast device.
 
-def GetIp():
-  """Returns this machine's external IP address.
+  Connecting a datagram socket picks the local interface the kernel would
+  route packets to cast_host through; no traffic is actually sent.
+
+  Args:
+    cast_host: str, The address of the cast device.
 
   Returns:
-    str: This machine's external IP address.
+    str: This machine's IP address as reachable from the cast device.
   """
   s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-  s.connect(("8.8.8.8", 80))
-  return s.getsockname()[0]
+  try:
+    s.connect((cast_host, 9))
+    return s.getsockname()[0]
+  finally:
+    s.close()
 
 
 def GetCast(friendly_name):
@@ -200,7 +478,12 @@ def GetCast(friendly_name):
   Raises:
     ValueError: No cast device with the specifed friendly name could be found.
   """
-  chromecasts, browser = pychromecast.get_chromecasts()
+  # Deferred import: pychromecast pulls in zeroconf and protobuf, which take
+  # substantial time to load and aren't needed for e.g. --help.
+  import pychromecast.pychromecast as pychromecast
+
+  chromecasts, browser = pychromecast.get_listed_chromecasts(
+      friendly_names=[friendly_name])
   for cast in chromecasts:
     if cast.device.friendly_name == friendly_name:
       return (cast, browser)
@@ -208,25 +491,28 @@ def GetCast(friendly_name):
       [cc.device.friendly_name for cc in chromecasts]))
 
 
-def PlayMedia(port, media_controller, filename, has_subtitles):
+def PlayMedia(host, port, media_controller, filename, subtitles_mime_type):
   """Starts media playback on a cast device.
 
   HTTP server must be running when this function is called.
 
   Args:
+    host: str, The address of the HTTP server on this machine, as reachable
+        from the cast device.
     port: int, The port of the HTTP server on this machine.
     media_controller: pychromecast.MediaController, the media controller of the
         target cast device.
     filename: str, The local video filename to play.
-    has_subtitles: bool, Whether there is a subtitles track.
+    subtitles_mime_type: Optional[str], The MIME type of the subtitles track,
+        or None if there is no subtitles track.
   """
-  videotype, _ = mimetypes.guess_type(filename)
+  videotype = _GuessMimeType(filename)
 
-  ip = GetIp()
-  url = "http://{}:{}/video".format(ip, port)
-  suburl = "http://{}:{}/subtitles".format(ip, port) if has_subtitles else None
+  url = "http://{}:{}/video".format(host, port)
+  suburl = ("http://{}:{}/subtitles".format(host, port)
+            if subtitles_mime_type else None)
   media_controller.play_media(url, videotype, subtitles=suburl,
-                              subtitles_mime=global_subtitles_mime_type)
+                              subtitles_mime=subtitles_mime_type)
   media_controller.block_until_active()
 
 
@@ -248,6 +534,9 @@ def main():
   parser = argparse.ArgumentParser(description="Cast media.")
   parser.add_argument("--device", type=str,
                       help="The name of the device to cast to")
+  parser.add_argument("--host", type=str,
+                      help="This machine's address as reachable from the cast "
+                           "device (skips automatic detection)")
   parser.add_argument("--port", type=int, default=8080,
                       help="The port to serve HTTP content on")
   parser.add_argument("--subtitles_file", type=str,
@@ -255,39 +544,62 @@ def main():
   parser.add_argument("--subtitles_mime_type", type=str,
                       default=DEFAULT_SUBTITLES_MIME_TYPE,
                       help="MIME type of subtitles")
+  parser.add_argument("--copy_buffer_size", type=int,
+                      default=FILE_COPY_BUFFER_SIZE,
+                      help="Chunk size in bytes for non-sendfile copies; "
+                           "each concurrent request may use one buffer of "
+                           "this size")
+  parser.add_argument("--verbose", action="store_true",
+                      help="Log individual HTTP requests")
   parser.add_argument("filename", metavar="FILENAME", type=str,
                       help="The file to cast")
   args = parser.parse_args()
 
-  global global_video_file
-  global_video_file = CanonicalizeFilePath(args.filename)
+  global global_verbose
+  global_verbose = args.verbose
+
+  global global_copy_buffer_size
+  global_copy_buffer_size = args.copy_buffer_size
+
+  video_file = CanonicalizeFilePath(args.filename)
+  CastHTTPRequestHandler.served_files["/video"] = _OpenServedFile(video_file)
 
-  global global_subtitles_file
-  global global_subtitles_mime_type
+  subtitles_mime_type = None
   if args.subtitles_file:
-    global_subtitles_file = CanonicalizeFilePath(args.subtitles_file)
-    global_subtitles_mime_type = args.subtitles_mime_type
+    subtitles_file = CanonicalizeFilePath(args.subtitles_file)
+    subtitles_mime_type = args.subtitles_mime_type
+    CastHTTPRequestHandler.served_files["/subtitles"] = _OpenServedFile(
+        subtitles_file, subtitles_mime_type)
 
   cast, browser = GetCast(args.device)
   cast.wait()
 
-  callable_http_server = CallableHttpServer(args.port)
-  http_server_thread = threading.Thread(target=callable_http_server,
-                                        daemon=True)
-  http_server_thread.start()
-
-  # Sleep briefly while the server thread starts up.
-  time.sleep(2)
-
-  PlayMedia(args.port, cast.media_controller, args.filename,
-            args.subtitles_file is not None)
+  # With SO_REUSEPORT, one server per CPU shares the port; the kernel
+  # round-robins accepted connections across them.
+  num_servers = (os.cpu_count() or 1) if hasattr(socket, "SO_REUSEPORT") else 1
+  http_server_ready = threading.Event()
+  http_server_threads = []
+  for _ in range(num_servers):
+    http_server_thread = threading.Thread(target=RunHttpServer,
+                                          args=(args.port, http_server_ready),
+                                          daemon=True)
+    http_server_thread.start()
+    http_server_threads.append(http_server_thread)
+
+  # Wait until a server socket is bound and listening.
+  http_server_ready.wait(5.0)
+
+  host = args.host if args.host else _GetIp(cast.socket_client.host)
+  PlayMedia(host, args.port, cast.media_controller, args.filename,
+            subtitles_mime_type)
 
   # Now that playback has started we can stop the browser.
   browser.stop_discovery()
 
-  # http_server_thread never actually terminates. For now this script has to be
+  # The server threads never actually terminate. For now this script has to be
   # killed.
-  http_server_thread.join()
+  for http_server_thread in http_server_threads:
+    http_server_thread.join()
 
 
 if __name__ == "__main__":